@@ -3,20 +3,27 @@
 # - Seeds items & rates from XLSM (INVOICE sheet bottom list)
 # - Dedupe by item + UPSERT on seed (no UNIQUE errors)
 # - Loader accepts numeric-text rates (fixes "blank items" issue)
-# - Billing & Inventory pages PRE-POPULATE rows for ALL master items
+# - Billing & Inventory pages PRE-POPULATE rows for ALL master items (search-to-add above INV_BILL_PREFILL_MAX)
 # - Report export bug fixed (writer.book + buffer.getvalue())
 # - UI: background image / animated gradient, subtle animations, balloons/snow
 # - Streamlit deprecation fixed: use width="stretch" instead of use_container_width
 
-import os, io, base64, sqlite3, datetime as dt
-from typing import List, Tuple
+import os, io, base64, hashlib, sqlite3, threading, datetime as dt
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+import numpy as np
 import pandas as pd
 import streamlit as st
+import xlsxwriter
+from openpyxl import load_workbook
 
 # ---------------- Config ----------------
 DB_PATH   = os.environ.get("INV_BILL_DB",  "inventory_billing.db")
 XLSM_PATH = os.environ.get("INV_BILL_XLSM", "DAY REPORT 28.09.2025.xlsm")
 
+# Billing/Inventory editors list every master item up to this size; larger catalogs switch to search
+PREFILL_MAX_ITEMS = int(os.environ.get("INV_BILL_PREFILL_MAX", "300"))
+
 # Optional background image: put file next to script or set BACKGROUND_IMAGE_URL
 BACKGROUND_IMAGE_URL = os.environ.get("BACKGROUND_IMAGE_URL", "")
 LOCAL_BG_CANDIDATES  = ["bg.jpg", "bg.jpeg", "bg.png", "background.jpg", "background.png"]
@@ -24,24 +31,29 @@ LOCAL_BG_CANDIDATES  = ["bg.jpg", "bg.jpeg", "bg.png", "background.jpg", "backgr
 st.set_page_config(page_title="Inventory & Billing System", page_icon="🧮", layout="wide")
 
 # ---------------- Helpers: Background & CSS ----------------
-def _local_bg_b64() -> str:
+def _local_bg_path() -> str:
     for fname in LOCAL_BG_CANDIDATES:
         if os.path.exists(fname):
-            with open(fname, "rb") as f:
-                return base64.b64encode(f.read()).decode()
+            return fname
     return ""
 
-def inject_css():
-    b64 = _local_bg_b64()
-    if BACKGROUND_IMAGE_URL:
-        bg_css = f"background: url('{BACKGROUND_IMAGE_URL}') no-repeat center center/cover fixed;"
+def _local_bg_b64(path: str) -> str:
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+@st.cache_data(show_spinner=False)
+def _compute_css(bg_url: str, bg_path: str, bg_mtime: float) -> str:
+    """Full <style> block; re-encoded only when the URL, image file or its mtime changes."""
+    b64 = _local_bg_b64(bg_path) if bg_path and not bg_url else ""
+    if bg_url:
+        bg_css = f"background: url('{bg_url}') no-repeat center center/cover fixed;"
     elif b64:
         bg_css = f"background: url('data:image/jpg;base64,{b64}') no-repeat center center/cover fixed;"
     else:
         bg_css = ("background: linear-gradient(120deg, #111827 0%, #0f172a 50%, #111827 100%) fixed;"
                   "background-size: 400% 400%; animation: bgshift 22s ease infinite;")
 
-    st.markdown(f"""
+    return f"""
     <style>
     .stApp {{ {bg_css} }}
     .block-container {{
@@ -77,16 +89,60 @@ def inject_css():
     @keyframes float {{ 0%{{transform:translateY(0)}} 50%{{transform:translateY(-4px)}} 100%{{transform:translateY(0)}} }}
     @keyframes pulse {{ 0%{{box-shadow:0 0 0 rgba(14,165,233,.10)}} 50%{{box-shadow:0 0 20px rgba(14,165,233,.25)}} 100%{{box-shadow:0 0 0 rgba(14,165,233,.10)}} }}
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def inject_css():
+    bg_path = _local_bg_path()
+    bg_mtime = os.path.getmtime(bg_path) if bg_path else 0.0
+    st.markdown(_compute_css(BACKGROUND_IMAGE_URL, bg_path, bg_mtime), unsafe_allow_html=True)
 
 inject_css()
 
 # ---------------- DB ----------------
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-    conn.execute("PRAGMA foreign_keys=ON;")
+# In-process access is serialized by get_conn()'s lock; WAL + synchronous=NORMAL make each commit cheaper
+# (no fsync per transaction) and let readers in other processes run alongside a writer.
+SQLITE_PRAGMAS = """
+PRAGMA foreign_keys=ON;
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA cache_size=-65536;
+"""
+
+@st.cache_resource
+def _shared_conn() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None,
+                           detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+    conn.executescript(SQLITE_PRAGMAS)
     return conn
 
+@st.cache_resource
+def _conn_lock() -> threading.RLock:
+    return threading.RLock()
+
+@contextmanager
+def get_conn() -> Iterator[sqlite3.Connection]:
+    """One shared connection per process, held under a process-wide lock for the `with` block, which
+    commits/rolls back without closing. Session threads can't interleave statements or end each other's
+    transactions. Autocommit (isolation_level=None): writers go through write_txn()."""
+    conn = _shared_conn()
+    with _conn_lock(), conn:
+        yield conn
+
+@contextmanager
+def write_txn() -> Iterator[sqlite3.Connection]:
+    """BEGIN IMMEDIATE ... COMMIT with the connection lock held throughout; an exception rolls back
+    only the transaction opened here, then re-raises."""
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
 def init_db():
     with get_conn() as conn:
         cur = conn.cursor()
@@ -135,37 +191,41 @@ def init_db():
             amount REAL NOT NULL,
             note TEXT
         );""")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_invoices_date ON invoices(date);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_mov_date ON inventory_movements(date);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_mov_item_date ON inventory_movements(item, date);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_col_date ON collections(date);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_lines_invoice ON invoice_lines(invoice_id, line_no);")
         conn.commit()
 
 # ---------------- Import from XLSM ----------------
+@st.cache_data(show_spinner=False)
+def _load_items_cached(xlsm_path: str, mtime: float) -> pd.DataFrame:
+    """Parse once per (path, mtime); editing the workbook bumps mtime and forces a re-parse."""
+    # Stream only columns C:D (item, rate) instead of materializing the whole sheet
+    wb = load_workbook(xlsm_path, read_only=True, data_only=True)
+    try:
+        rows = [(it, rate) for it, rate in wb["INVOICE"].iter_rows(min_col=3, max_col=4, values_only=True)
+                if isinstance(it, str) and it.strip() != ""]
+    finally:
+        wb.close()
+
+    items = pd.DataFrame(rows, columns=["item", "rate"], dtype=object)
+    # Arrow-backed strings: strip/len/replace run as contiguous UTF-8 kernels, not per-object calls
+    items["item"] = items["item"].astype("string[pyarrow]").str.strip()
+    # Numeric text like "1,250" -> 1250.0; blanks/garbage -> NaN (dropped below)
+    rate_txt = items["rate"].astype("string[pyarrow]").str.replace(",", "", regex=False).str.strip()
+    items["rate"] = pd.to_numeric(rate_txt, errors="coerce").astype("float64")
+
+    items = items.dropna(subset=["item", "rate"])
+    items = items[items["item"].str.len() > 0]
+    items = items.drop_duplicates(subset="item", keep="last")
+    return items.reset_index(drop=True)
+
 def load_items_from_xlsm(xlsm_path: str) -> pd.DataFrame:
     """Parse items & rates from INVOICE sheet; accept numeric text; dedupe by item."""
     try:
-        xls = pd.ExcelFile(xlsm_path)
-        df = pd.read_excel(xls, sheet_name="INVOICE", header=None)
-
-        items = df[[2, 3]].dropna(how="all")
-        items = items[items[2].apply(lambda x: isinstance(x, str) and x.strip() != "")]
-
-        def parse_rate(val):
-            try:
-                if pd.isna(val): return None
-                if isinstance(val, str):
-                    s = val.strip().replace(",", "")
-                    if s == "": return None
-                    return float(s)
-                return float(val)
-            except Exception:
-                return None
-
-        items = items.rename(columns={2: "item", 3: "rate"})
-        items["item"] = items["item"].astype(str).str.strip()
-        items["rate"] = items["rate"].apply(parse_rate)
-
-        items = items.dropna(subset=["item", "rate"])
-        items = items[items["item"].str.len() > 0]
-        items = items.groupby("item", as_index=False).agg(rate=("rate", "last"))
-        return items.reset_index(drop=True)
+        return _load_items_cached(xlsm_path, os.path.getmtime(xlsm_path))
     except Exception as e:
         st.warning(f"Couldn't auto-import items from XLSM: {e}")
         return pd.DataFrame(columns=["item", "rate"])
@@ -173,19 +233,19 @@ def load_items_from_xlsm(xlsm_path: str) -> pd.DataFrame:
 def ensure_seed_items():
     with get_conn() as conn:
         n = conn.execute("SELECT COUNT(*) FROM items;").fetchone()[0]
-        if n == 0 and os.path.exists(XLSM_PATH):
-            items = load_items_from_xlsm(XLSM_PATH)
-            if len(items):
-                for _, r in items.iterrows():
-                    conn.execute(
-                        "INSERT INTO items(item, rate) VALUES(?, ?) "
-                        "ON CONFLICT(item) DO UPDATE SET rate=excluded.rate;",
-                        (str(r["item"]).strip(), float(r["rate"]))
-                    )
-                conn.commit()
-                st.success(f"Loaded {len(items)} items & rates from '{XLSM_PATH}'.")
-        elif n == 0:
-            st.info("No items found. Add in 'Master Data' or set INV_BILL_XLSM to auto-import.")
+    if n == 0 and os.path.exists(XLSM_PATH):
+        items = load_items_from_xlsm(XLSM_PATH)
+        if len(items):
+            with write_txn() as conn:
+                conn.executemany(
+                    "INSERT INTO items(item, rate) VALUES(?, ?) "
+                    "ON CONFLICT(item) DO UPDATE SET rate=excluded.rate;",
+                    [(str(r["item"]).strip(), float(r["rate"])) for _, r in items.iterrows()]
+                )
+            invalidate_items_cache()
+            st.success(f"Loaded {len(items)} items & rates from '{XLSM_PATH}'.")
+    elif n == 0:
+        st.info("No items found. Add in 'Master Data' or set INV_BILL_XLSM to auto-import.")
 
 def upsert_item(item: str, rate: float):
     with get_conn() as conn:
@@ -195,18 +255,56 @@ def upsert_item(item: str, rate: float):
             (item.strip(), float(rate))
         )
         conn.commit()
+    invalidate_items_cache()
 
+@st.cache_data(ttl=60)
 def get_items_df() -> pd.DataFrame:
     with get_conn() as conn:
         return pd.read_sql_query("SELECT item, rate FROM items ORDER BY item;", conn)
 
+@st.cache_resource(ttl=60)
+def get_rate_map() -> dict:
+    """item -> rate, shared read-only across reruns (cache_resource skips the per-hit copy)."""
+    items_df = get_items_df()
+    return dict(zip(items_df["item"], items_df["rate"].astype(float)))
+
+@st.cache_resource
+def _items_version() -> dict:
+    """Process-wide counter bumped on every items write; sessions compare against it."""
+    return {"v": 0}
+
+def invalidate_items_cache():
+    get_items_df.clear()
+    get_rate_map.clear()
+    _items_version()["v"] += 1
+
+def _refresh_master():
+    items_df = get_items_df()
+    st.session_state["master"] = {
+        "version": _items_version()["v"],
+        "items_df": items_df,
+        "item_names": items_df["item"].tolist(),
+        "rate_map": get_rate_map(),
+    }
+
+def get_master() -> dict:
+    """items_df / item_names / rate_map memoized in session_state until items change."""
+    master = st.session_state.get("master")
+    if master is None or master["version"] != _items_version()["v"]:
+        _refresh_master()
+    return st.session_state["master"]
+
 # ---------------- Business ops ----------------
 def create_invoice(date: dt.date, person_name: str, lines: List[dict],
                    collection_amount: float, notes: str = "") -> int:
-    total = sum((float(l.get("unit_price", 0)) * float(l.get("qty", 0))) for l in lines)
+    lines = [l for l in lines if l.get("item")]
+    n = len(lines)
+    prices = np.fromiter((float(l.get("unit_price") or 0) for l in lines), dtype=np.float64, count=n)
+    qtys = np.fromiter((float(l.get("qty") or 0) for l in lines), dtype=np.float64, count=n)
+    total = float(prices @ qtys)
     due = total - float(collection_amount or 0)
 
-    with get_conn() as conn:
+    with write_txn() as conn:
         cur = conn.cursor()
         cur.execute(
             "INSERT INTO invoices(date, person_name, total_amount, collection_amount, due_amount, notes) "
@@ -215,47 +313,100 @@ def create_invoice(date: dt.date, person_name: str, lines: List[dict],
         )
         inv_id = cur.lastrowid
 
-        for i, line in enumerate(lines, start=1):
-            if not line.get("item"): continue
-            cur.execute(
-                "INSERT INTO invoice_lines(invoice_id, line_no, item, unit_price, qty, units) "
-                "VALUES(?,?,?,?,?,?);",
-                (inv_id, i, line["item"], float(line.get("unit_price") or 0),
-                 float(line.get("qty") or 0), line.get("units", ""))
-            )
+        line_rows = [
+            (inv_id, i, line["item"], float(p), float(q), line.get("units", ""))
+            for i, (line, p, q) in enumerate(zip(lines, prices, qtys), start=1)
+        ]
+        cur.executemany(
+            "INSERT INTO invoice_lines(invoice_id, line_no, item, unit_price, qty, units) "
+            "VALUES(?,?,?,?,?,?);",
+            line_rows
+        )
 
         if collection_amount and collection_amount != 0:
             cur.execute(
                 "INSERT INTO collections(date, amount, note) VALUES(?,?,?);",
                 (date.isoformat(), float(collection_amount), f"Invoice #{inv_id} - {person_name}")
             )
-        conn.commit()
     return inv_id
 
 def add_inventory_movement(date: dt.date, rows: List[dict]):
+    payload = [
+        (date.isoformat(), r.get("item"),
+         float(r.get("opening_balance") or 0.0),
+         float(r.get("stock_in") or 0.0),
+         float(r.get("stock_out") or 0.0),
+         float(r.get("stock_returning_today") or 0.0))
+        for r in rows if r.get("item")
+    ]
+    with write_txn() as conn:
+        conn.executemany(
+            "INSERT INTO inventory_movements(date, item, opening_balance, stock_in, stock_out, stock_returning_today) "
+            "VALUES(?,?,?,?,?,?);",
+            payload
+        )
+
+def _read_sql(query: str, params: tuple = ()) -> pd.DataFrame:
+    """Arrow-backed read for extracts/reports: columnar strings, nullable numerics."""
     with get_conn() as conn:
-        cur = conn.cursor()
-        for r in rows:
-            if not r.get("item"): continue
-            cur.execute(
-                "INSERT INTO inventory_movements(date, item, opening_balance, stock_in, stock_out, stock_returning_today) "
-                "VALUES(?,?,?,?,?,?);",
-                (date.isoformat(), r.get("item"),
-                 float(r.get("opening_balance") or 0.0),
-                 float(r.get("stock_in") or 0.0),
-                 float(r.get("stock_out") or 0.0),
-                 float(r.get("stock_returning_today") or 0.0))
-            )
-        conn.commit()
+        return pd.read_sql_query(query, conn, params=params, dtype_backend="pyarrow")
 
 def df_to_csv_download(df: pd.DataFrame, filename: str) -> Tuple[bytes, str]:
     return df.to_csv(index=False).encode("utf-8"), filename
 
-def df_to_excel_download(df: pd.DataFrame, filename: str) -> Tuple[bytes, str]:
+def sheets_to_xlsx(sheets: List[Tuple[str, pd.DataFrame]], title: str = "") -> bytes:
+    """Row-ordered xlsxwriter export in constant_memory mode (pandas' to_excel writes
+    column-by-column, which constant_memory would silently truncate)."""
     buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Data")
-    return buf.getvalue(), filename
+    book = xlsxwriter.Workbook(buf, {"constant_memory": True, "strings_to_numbers": False,
+                                     "default_date_format": "yyyy-mm-dd"})
+    header_fmt = book.add_format({"bold": True, "border": 1})
+    for name, df in sheets:
+        ws = book.add_worksheet(name)
+        ws.write_row(0, 0, [str(c) for c in df.columns], header_fmt)
+        body = df.astype(object).where(df.notna(), None)
+        for r, row in enumerate(body.itertuples(index=False, name=None), start=1):
+            ws.write_row(r, 0, row)
+    if title:
+        book.set_properties({"title": title})
+    book.close()
+    return buf.getvalue()
+
+def df_to_excel_download(df: pd.DataFrame, filename: str) -> Tuple[bytes, str]:
+    return sheets_to_xlsx([("Data", df)]), filename
+
+def pick_listed_items(items_df: pd.DataFrame, label: str, key: str) -> pd.DataFrame:
+    """All master items for small catalogs; above PREFILL_MAX_ITEMS only the ones picked via search."""
+    if len(items_df) <= PREFILL_MAX_ITEMS:
+        return items_df
+    chosen = st.multiselect(f"{label} ({len(items_df):,} in Master Data — type to search)",
+                            items_df["item"].tolist(), key=key)
+    return items_df[items_df["item"].isin(chosen)]
+
+def listed_data_editor(key: str, default_df: pd.DataFrame, carry_cols: List[str], **editor_kwargs) -> pd.DataFrame:
+    """st.data_editor over the pre-listed rows. The editor stores edits by row position, so its key follows
+    the listed rows: picking or dropping items starts a fresh editor instead of replaying edits onto shifted
+    rows. Values already entered in `carry_cols` are carried over by item name, and rows the user added for
+    items outside the listed set are kept and appended to the new editor."""
+    digest = hashlib.md5(pd.util.hash_pandas_object(default_df, index=False).to_numpy().tobytes()).hexdigest()[:16]
+    editor_key = f"{key}_{digest}"
+    base = st.session_state.get(f"{key}_base")
+    if base is None or base[0] != editor_key:
+        seed = default_df.copy()
+        carried = st.session_state.get(f"{key}_carry")
+        if carried is not None and len(seed):
+            hit = seed["item"].isin(carried.index)
+            seed.loc[hit, carry_cols] = carried.loc[seed.loc[hit, "item"], carry_cols].to_numpy()
+        extra = st.session_state.get(f"{key}_extra")
+        if extra is not None and len(extra):
+            seed = pd.concat([seed, extra[~extra["item"].isin(seed["item"])]], ignore_index=True)
+        base = (editor_key, seed)
+        st.session_state[f"{key}_base"] = base
+    edited = st.data_editor(base[1], key=editor_key, **editor_kwargs)
+    named = edited[edited["item"].fillna("").astype(str).str.strip() != ""]
+    st.session_state[f"{key}_carry"] = named.drop_duplicates("item", keep="last").set_index("item")[carry_cols]
+    st.session_state[f"{key}_extra"] = named[~named["item"].isin(default_df["item"])].drop_duplicates("item", keep="last")
+    return edited
 
 # ---------------- UI ----------------
 st.markdown("<h1 class='title'>🧮 Inventory & Billing System</h1>", unsafe_allow_html=True)
@@ -278,21 +429,23 @@ if page == "Billing":
     with c3:
         notes = st.text_input("Notes (optional)", placeholder="Any remarks...")
 
-    items_df = get_items_df()
-    item_names = items_df["item"].tolist()
-    rate_map = dict(zip(items_df["item"], items_df["rate"]))
+    master = get_master()
+    items_df, item_names, rate_map = master["items_df"], master["item_names"], master["rate_map"]
 
     st.markdown("#### Line Items (auto-listed from Master Data)")
-    if len(items_df) > 0:
+    listed_df = pick_listed_items(items_df, "Items to bill", key="billing_pick")
+    if len(listed_df) > 0:
         default_rows = [
             {"item": row["item"], "unit_price": float(row["rate"] or 0), "qty": 0.0, "units": "UNITS"}
-            for _, row in items_df.iterrows()
+            for _, row in listed_df.iterrows()
         ]
     else:
         default_rows = [{"item": "", "unit_price": 0.0, "qty": 0.0, "units": "UNITS"} for _ in range(10)]
 
-    edited = st.data_editor(
+    edited = listed_data_editor(
+        "billing_editor",
         pd.DataFrame(default_rows),
+        ["qty", "units"],
         column_config={
             "item": st.column_config.SelectboxColumn("ITEM NAME", options=item_names, required=False, width="large"),
             "unit_price": st.column_config.NumberColumn("UNIT PRICE", step=0.01, format="%.2f"),
@@ -301,16 +454,14 @@ if page == "Billing":
         },
         num_rows="dynamic",
         width="stretch",            # <— updated
-        key="billing_editor",
     )
 
     def autofill_prices(df: pd.DataFrame) -> pd.DataFrame:
         out = df.copy()
-        for idx, row in out.iterrows():
-            it = str(row.get("item") or "").strip()
-            if it and (not row.get("unit_price") or float(row["unit_price"]) == 0.0):
-                if it in rate_map:
-                    out.at[idx, "unit_price"] = float(rate_map[it])
+        mapped = out["item"].fillna("").astype(str).str.strip().map(rate_map).astype(float)
+        price = out["unit_price"].astype(float)
+        mask = (price.fillna(0.0) == 0.0) & mapped.notna()
+        out["unit_price"] = price.mask(mask, mapped)
         return out
 
     edited = autofill_prices(edited)
@@ -329,7 +480,7 @@ if page == "Billing":
             st.error("Person Name is required.")
         else:
             lines = []
-            for _, r in edited.iterrows():
+            for r in edited.to_dict("records"):
                 it = str(r.get("item") or "").strip()
                 qty = float(r.get("qty") or 0)
                 if not it or qty == 0:
@@ -358,18 +509,19 @@ elif page == "Inventory":
     st.subheader("Inventory Movements")
     date_val = st.date_input("Date", value=dt.date.today(), key="inv_date")
 
-    items_df = get_items_df()
-    item_names = items_df["item"].tolist()
+    master = get_master()
+    items_df, item_names = master["items_df"], master["item_names"]
 
     st.markdown("Enter movements; rows auto-listed from Master Data. Closing/Remaining auto-computed.")
-    if len(items_df) > 0:
+    listed_df = pick_listed_items(items_df, "Items to record", key="inv_pick")
+    if len(listed_df) > 0:
         default_rows = [{
             "item": row["item"],
             "opening_balance": 0.0,
             "stock_in": 0.0,
             "stock_out": 0.0,
             "stock_returning_today": 0.0,
-        } for _, row in items_df.iterrows()]
+        } for _, row in listed_df.iterrows()]
     else:
         default_rows = [{
             "item": "",
@@ -379,8 +531,10 @@ elif page == "Inventory":
             "stock_returning_today": 0.0,
         } for _ in range(10)]
 
-    inv_edit = st.data_editor(
+    inv_edit = listed_data_editor(
+        "inv_editor",
         pd.DataFrame(default_rows),
+        ["opening_balance", "stock_in", "stock_out", "stock_returning_today"],
         column_config={
             "item": st.column_config.SelectboxColumn("ITEM", options=item_names, required=False, width="large"),
             "opening_balance": st.column_config.NumberColumn("OPENING STOCK BALANCE", step=1.0, format="%.2f"),
@@ -390,21 +544,20 @@ elif page == "Inventory":
         },
         num_rows="dynamic",
         width="stretch",           # <— updated
-        key="inv_editor",
     )
 
     inv_preview = inv_edit.copy()
-    for col in ["opening_balance", "stock_in", "stock_out", "stock_returning_today"]:
-        inv_preview[col] = inv_preview[col].astype(float).fillna(0.0)
-    inv_preview["closing_balance"] = (
-        inv_preview["opening_balance"] + inv_preview["stock_in"] - inv_preview["stock_out"] + inv_preview["stock_returning_today"]
-    ).round(2)
+    mov_cols = ["opening_balance", "stock_in", "stock_out", "stock_returning_today"]
+    inv_preview[mov_cols] = inv_preview[mov_cols].fillna(0.0).astype(np.float64)
+    # closing = opening + in - out + returning, as one (N x 4) @ (4,) product
+    inv_preview["closing_balance"] = np.round(
+        inv_preview[mov_cols].to_numpy() @ np.array([1.0, 1.0, -1.0, 1.0]), 2)
     inv_preview["stock_remaining"] = inv_preview["closing_balance"]
     st.dataframe(inv_preview, width="stretch")   # <— updated
 
     if st.button("💾 Save Movements"):
         rows = []
-        for _, r in inv_edit.iterrows():
+        for r in inv_edit.to_dict("records"):
             it = str(r.get("item") or "").strip()
             if not it: continue
             rows.append({
@@ -433,9 +586,8 @@ elif page == "Data Extraction":
         cols = st.multiselect("Columns",
                               ["id","date","person_name","total_amount","collection_amount","due_amount","notes"],
                               default=["id","date","person_name","total_amount","collection_amount","due_amount"])
-        with get_conn() as conn:
-            q = "SELECT " + ", ".join(cols) + " FROM invoices WHERE date BETWEEN ? AND ? ORDER BY date, id;"
-            df = pd.read_sql_query(q, conn, params=(d1.isoformat(), d2.isoformat()))
+        q = "SELECT " + ", ".join(cols) + " FROM invoices WHERE date BETWEEN ? AND ? ORDER BY date, id;"
+        df = _read_sql(q, (d1.isoformat(), d2.isoformat()))
         st.dataframe(df, width="stretch")   # <— updated
         csvg, fn = df_to_csv_download(df, "invoices.csv")
         st.download_button("⬇️ Download CSV", csvg, file_name=fn, mime="text/csv")
@@ -443,13 +595,12 @@ elif page == "Data Extraction":
         st.download_button("⬇️ Download Excel", xlsxg, file_name=fnx)
 
         st.markdown("**Invoice Lines**")
-        with get_conn() as conn:
-            ql = (
-                "SELECT il.invoice_id, i.date, i.person_name, il.line_no, il.item, il.unit_price, il.qty, il.amount "
-                "FROM invoice_lines il JOIN invoices i ON i.id = il.invoice_id "
-                "WHERE i.date BETWEEN ? AND ? ORDER BY il.invoice_id, il.line_no;"
-            )
-            dfl = pd.read_sql_query(ql, conn, params=(d1.isoformat(), d2.isoformat()))
+        ql = (
+            "SELECT il.invoice_id, i.date, i.person_name, il.line_no, il.item, il.unit_price, il.qty, il.amount "
+            "FROM invoice_lines il JOIN invoices i ON i.id = il.invoice_id "
+            "WHERE i.date BETWEEN ? AND ? ORDER BY il.invoice_id, il.line_no;"
+        )
+        dfl = _read_sql(ql, (d1.isoformat(), d2.isoformat()))
         st.dataframe(dfl, width="stretch")  # <— updated
         csvg2, fn2 = df_to_csv_download(dfl, "invoice_lines.csv")
         st.download_button("⬇️ Download Lines CSV", csvg2, file_name=fn2, mime="text/csv")
@@ -462,9 +613,8 @@ elif page == "Data Extraction":
             "Columns",
             ["date","item","opening_balance","stock_in","stock_out","stock_returning_today","closing_balance","stock_remaining"],
             default=["date","item","opening_balance","stock_in","stock_out","stock_returning_today","closing_balance","stock_remaining"])
-        with get_conn() as conn:
-            q = "SELECT " + ", ".join(inv_cols) + " FROM inventory_movements WHERE date BETWEEN ? AND ? ORDER BY date, item;"
-            df = pd.read_sql_query(q, conn, params=(d1.isoformat(), d2.isoformat()))
+        q = "SELECT " + ", ".join(inv_cols) + " FROM inventory_movements WHERE date BETWEEN ? AND ? ORDER BY date, item;"
+        df = _read_sql(q, (d1.isoformat(), d2.isoformat()))
         st.dataframe(df, width="stretch")   # <— updated
         csvg, fn = df_to_csv_download(df, "inventory.csv")
         st.download_button("⬇️ Download CSV", csvg, file_name=fn, mime="text/csv")
@@ -475,10 +625,8 @@ elif page == "Data Extraction":
         c1, c2 = st.columns(2)
         with c1: d1 = st.date_input("From Date  ", value=dt.date.today().replace(day=1), key="col_from")
         with c2: d2 = st.date_input("To Date    ", value=dt.date.today(), key="col_to")
-        with get_conn() as conn:
-            df = pd.read_sql_query(
-                "SELECT date, amount, note FROM collections WHERE date BETWEEN ? AND ? ORDER BY date;",
-                conn, params=(d1.isoformat(), d2.isoformat()))
+        df = _read_sql("SELECT date, amount, note FROM collections WHERE date BETWEEN ? AND ? ORDER BY date;",
+                       (d1.isoformat(), d2.isoformat()))
         st.dataframe(df, width="stretch")   # <— updated
         csvg, fn = df_to_csv_download(df, "collections.csv")
         st.download_button("⬇️ Download CSV", csvg, file_name=fn, mime="text/csv")
@@ -488,25 +636,31 @@ elif page == "Reports":
     st.subheader("Reports")
     rep_date = st.date_input("Report Date", value=dt.date.today())
 
+    # KPIs straight from SQLite; the row-level fetch is skipped on days without bills
     with get_conn() as conn:
-        inv = pd.read_sql_query(
+        n_bills, inv_total, inv_coll, inv_due = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(total_amount), 0), COALESCE(SUM(collection_amount), 0), "
+            "COALESCE(SUM(due_amount), 0) FROM invoices WHERE date = ?;",
+            (rep_date.isoformat(),)
+        ).fetchone()
+    if n_bills:
+        inv = _read_sql(
             "SELECT id, person_name, total_amount, collection_amount, due_amount "
             "FROM invoices WHERE date = ? ORDER BY id;",
-            conn, params=(rep_date.isoformat(),)
-        )
-        inv_total = inv["total_amount"].sum() if not inv.empty else 0.0
-        inv_coll  = inv["collection_amount"].sum() if not inv.empty else 0.0
-        inv_due   = inv["due_amount"].sum() if not inv.empty else 0.0
-
-        inv_mov = pd.read_sql_query(
-            "SELECT m.item, m.date, m.closing_balance "
-            "FROM inventory_movements m "
-            "WHERE date <= ? ORDER BY m.item, m.date;",
-            conn, params=(rep_date.isoformat(),)
+            (rep_date.isoformat(),)
         )
-        latest = (inv_mov.sort_values(["item", "date"])
-                        .groupby("item", as_index=False).tail(1)
-                        .sort_values("item"))
+    else:
+        inv = pd.DataFrame(columns=["id", "person_name", "total_amount", "collection_amount", "due_amount"])
+
+    # Latest movement per item up to the report date (ties on date -> last inserted)
+    latest = _read_sql(
+        "SELECT item, date, closing_balance FROM ("
+        "  SELECT m.item, m.date, m.closing_balance, "
+        "         ROW_NUMBER() OVER (PARTITION BY m.item ORDER BY m.date DESC, m.id DESC) AS rn "
+        "  FROM inventory_movements m WHERE m.date <= ?"
+        ") WHERE rn = 1 ORDER BY item;",
+        (rep_date.isoformat(),)
+    )
 
     c1, c2, c3 = st.columns(3)
     with c1: st.metric("Total Billed (₹)", f"{inv_total:,.2f}")
@@ -519,19 +673,14 @@ elif page == "Reports":
     st.markdown("#### Inventory Snapshot (last closing up to date)")
     st.dataframe(latest.rename(columns={"closing_balance": "stock_remaining"}), width="stretch")  # <— updated
 
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-        inv.to_excel(writer, index=False, sheet_name="Bills")
-        latest.to_excel(writer, index=False, sheet_name="Inventory")
-        writer.book.set_properties({'title': f"Report {rep_date}"})
-    data = buf.getvalue()
+    data = sheets_to_xlsx([("Bills", inv), ("Inventory", latest)], title=f"Report {rep_date}")
     st.download_button("⬇️ Download Daily Report (Excel)", data=data, file_name=f"report_{rep_date}.xlsx")
 
 # ---------------- Master Data ----------------
 elif page == "Master Data":
     st.subheader("Items & Rates")
     st.caption("Seeded from XLSM (INVOICE sheet) on first run if DB was empty. You can add/edit here.")
-    df_items = get_items_df()
+    df_items = get_master()["items_df"]
     st.dataframe(df_items, width="stretch")   # <— updated
 
     with st.expander("Add / Update Item"):
@@ -556,14 +705,13 @@ elif page == "Master Data":
                 if items.empty:
                     st.warning("No items found in the XLSM.")
                 else:
-                    with get_conn() as conn:
-                        for _, r in items.iterrows():
-                            conn.execute(
-                                "INSERT INTO items(item, rate) VALUES(?, ?) "
-                                "ON CONFLICT(item) DO UPDATE SET rate=excluded.rate;",
-                                (str(r["item"]).strip(), float(r["rate"]))
-                            )
-                        conn.commit()
+                    with write_txn() as conn:
+                        conn.executemany(
+                            "INSERT INTO items(item, rate) VALUES(?, ?) "
+                            "ON CONFLICT(item) DO UPDATE SET rate=excluded.rate;",
+                            [(str(r["item"]).strip(), float(r["rate"])) for _, r in items.iterrows()]
+                        )
+                    invalidate_items_cache()
                     st.success(f"Imported/updated {len(items)} items.")
 
 # ---------------- About ----------------
@@ -9,11 +9,21 @@
 # - Streamlit width API (width="stretch"), background/animations
 # - **NEW:** DB migration: add 'highlight' column & ensure new tables exist
 
-import os, io, base64, sqlite3, smtplib, ssl, datetime as dt
+import os, io, base64, hashlib, hmac, sqlite3, smtplib, ssl, threading, datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from email.message import EmailMessage
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
+import numpy as np
 import pandas as pd
 import streamlit as st
+import xlsxwriter
+from openpyxl import load_workbook
+
+try:  # optional fast xlsx writer for df_to_excel_download
+    from pyexcelerate import Workbook as PyExcelerateWorkbook
+except ImportError:
+    PyExcelerateWorkbook = None
 
 # ---------------- Config ----------------
 DB_PATH   = os.environ.get("INV_BILL_DB",  "inventory_billing.db")
@@ -35,24 +45,30 @@ LOCAL_BG_CANDIDATES  = ["bg.jpg", "bg.jpeg", "bg.png", "background.jpg", "backgr
 st.set_page_config(page_title="Inventory & Billing System", page_icon="🧮", layout="wide")
 
 # ---------------- Helpers: Background & CSS ----------------
-def _local_bg_b64() -> str:
+def _local_bg_path() -> str:
     for fname in LOCAL_BG_CANDIDATES:
         if os.path.exists(fname):
-            with open(fname, "rb") as f:
-                return base64.b64encode(f.read()).decode()
+            return fname
     return ""
 
-def inject_css():
-    b64 = _local_bg_b64()
-    if BACKGROUND_IMAGE_URL:
-        bg_css = f"background: url('{BACKGROUND_IMAGE_URL}') no-repeat center center/cover fixed;"
+@st.cache_data(show_spinner=False)
+def _local_bg_b64(path: str, mtime: float) -> str:
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+@st.cache_data(show_spinner=False)
+def _compute_css(bg_url: str, bg_path: str, bg_mtime: float) -> str:
+    """Full <style> block; rebuilt only when the URL, image file or its mtime changes."""
+    b64 = _local_bg_b64(bg_path, bg_mtime) if bg_path and not bg_url else ""
+    if bg_url:
+        bg_css = f"background: url('{bg_url}') no-repeat center center/cover fixed;"
     elif b64:
         bg_css = f"background: url('data:image/jpg;base64,{b64}') no-repeat center center/cover fixed;"
     else:
         bg_css = ("background: linear-gradient(120deg, #111827 0%, #0f172a 50%, #111827 100%) fixed;"
                   "background-size: 400% 400%; animation: bgshift 22s ease infinite;")
 
-    st.markdown(f"""
+    return f"""
     <style>
     .stApp {{ {bg_css} }}
     .block-container {{
@@ -69,16 +85,62 @@ def inject_css():
     .subtitle {{ color:#cbd5e1; margin-top:-6px; }}
     @keyframes float {{ 0%{{transform:translateY(0)}} 50%{{transform:translateY(-4px)}} 100%{{transform:translateY(0)}} }}
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def inject_css():
+    bg_path = _local_bg_path()
+    bg_mtime = os.path.getmtime(bg_path) if bg_path else 0.0
+    st.markdown(_compute_css(BACKGROUND_IMAGE_URL, bg_path, bg_mtime), unsafe_allow_html=True)
 
 inject_css()
 
 # ---------------- DB core ----------------
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-    conn.execute("PRAGMA foreign_keys=ON;")
+# Per-connection tuning; journal_mode=WAL is persistent in the DB file, so init_all() sets it once.
+CONN_PRAGMAS = """
+PRAGMA foreign_keys=ON;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-40000;
+PRAGMA mmap_size=536870912;
+PRAGMA busy_timeout=5000;
+PRAGMA journal_size_limit=67108864;
+"""
+
+@st.cache_resource
+def _shared_conn() -> sqlite3.Connection:
+    # No detect_types: dates are stored and read back as ISO text, skipping a per-column converter on every row
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=128)
+    conn.executescript(CONN_PRAGMAS)
     return conn
 
+@st.cache_resource
+def _conn_lock() -> threading.RLock:
+    return threading.RLock()
+
+@contextmanager
+def get_conn() -> Iterator[sqlite3.Connection]:
+    """Shared connection held under the process-wide lock for the `with` block (writes go through write_txn())."""
+    conn = _shared_conn()
+    with _conn_lock(), conn:
+        yield conn
+
+@contextmanager
+def write_txn() -> Iterator[sqlite3.Connection]:
+    """BEGIN IMMEDIATE ... COMMIT with the connection lock held throughout; an exception rolls back
+    only the transaction opened here, then re-raises."""
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+def enable_wal():
+    with get_conn() as conn:
+        conn.execute("PRAGMA journal_mode=WAL;")
+
 def table_has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
     cur = conn.execute(f"PRAGMA table_info({table});")
     cols = [r[1] for r in cur.fetchall()]
@@ -148,6 +210,12 @@ def init_db_schema():
             amount REAL NOT NULL,
             note TEXT
         );""")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_invoices_date ON invoices(date);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_inventory_date_item ON inventory_movements(date, item);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_invoice_lines_invoice ON invoice_lines(invoice_id, line_no);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_invoice_collections_invoice ON invoice_collections(invoice_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_invoice_dues_invoice ON invoice_dues(invoice_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_collections_date ON collections(date);")
         conn.commit()
 
 def migrate_db():
@@ -178,26 +246,19 @@ def migrate_db():
 def load_items_from_xlsm(xlsm_path: str) -> pd.DataFrame:
     """Parse items & rates from INVOICE sheet; accept numeric text; dedupe by item."""
     try:
-        xls = pd.ExcelFile(xlsm_path)
-        df = pd.read_excel(xls, sheet_name="INVOICE", header=None)
-
-        items = df[[2, 3]].dropna(how="all")
-        items = items[items[2].apply(lambda x: isinstance(x, str) and x.strip() != "")]
-
-        def parse_rate(val):
-            try:
-                if pd.isna(val): return None
-                if isinstance(val, str):
-                    s = val.strip().replace(",", "")
-                    if s == "": return None
-                    return float(s)
-                return float(val)
-            except Exception:
-                return None
-
-        items = items.rename(columns={2: "item", 3: "rate"})
+        # Stream only columns C:D (item, rate) instead of loading the whole workbook
+        wb = load_workbook(xlsm_path, read_only=True, data_only=True, keep_vba=False)
+        try:
+            rows = [(it, rate) for it, rate in wb["INVOICE"].iter_rows(min_col=3, max_col=4, values_only=True)
+                    if isinstance(it, str) and it.strip() != ""]
+        finally:
+            wb.close()
+        items = pd.DataFrame(rows, columns=["item", "rate"], dtype=object)
+
         items["item"] = items["item"].astype(str).str.strip()
-        items["rate"] = items["rate"].apply(parse_rate)
+        # Numeric text like "1,250" -> 1250.0; blanks/garbage -> NaN (dropped below)
+        rate_txt = items["rate"].astype(str).str.replace(",", "", regex=False).str.strip()
+        items["rate"] = pd.to_numeric(rate_txt, errors="coerce")
 
         items = items.dropna(subset=["item", "rate"])
         items = items[items["item"].str.len() > 0]
@@ -207,37 +268,48 @@ def load_items_from_xlsm(xlsm_path: str) -> pd.DataFrame:
         st.warning(f"Couldn't auto-import items from XLSM: {e}")
         return pd.DataFrame(columns=["item", "rate"])
 
+ITEM_UPSERT_SQL = (
+    "INSERT INTO items(item, rate) VALUES(?, ?) "
+    "ON CONFLICT(item) DO UPDATE SET rate=excluded.rate;"
+)
+
+def upsert_items(items: pd.DataFrame):
+    """Bulk upsert of an item/rate frame in one write transaction; rows stream to executemany as plain tuples."""
+    rows = ((str(it).strip(), float(rt)) for it, rt in items[["item", "rate"]].itertuples(index=False, name=None))
+    with write_txn() as conn:
+        conn.executemany(ITEM_UPSERT_SQL, rows)
+    get_items_master.clear()
+
 def ensure_seed_items():
     with get_conn() as conn:
         n = conn.execute("SELECT COUNT(*) FROM items;").fetchone()[0]
-        if n == 0 and os.path.exists(XLSM_PATH):
-            items = load_items_from_xlsm(XLSM_PATH)
-            if len(items):
-                for _, r in items.iterrows():
-                    conn.execute(
-                        "INSERT INTO items(item, rate) VALUES(?, ?) "
-                        "ON CONFLICT(item) DO UPDATE SET rate=excluded.rate;",
-                        (str(r["item"]).strip(), float(r["rate"]))
-                    )
-                conn.commit()
-                st.success(f"Loaded {len(items)} items & rates from '{XLSM_PATH}'.")
-        elif n == 0:
-            st.info("No items found. Add in 'Master Data' or set INV_BILL_XLSM to auto-import.")
+    if n == 0 and os.path.exists(XLSM_PATH):
+        items = load_items_from_xlsm(XLSM_PATH)
+        if len(items):
+            upsert_items(items)
+            st.success(f"Loaded {len(items)} items & rates from '{XLSM_PATH}'.")
+    elif n == 0:
+        st.info("No items found. Add in 'Master Data' or set INV_BILL_XLSM to auto-import.")
 
 def upsert_item(item: str, rate: float):
+    with write_txn() as conn:
+        conn.execute(ITEM_UPSERT_SQL, (item.strip(), float(rate)))
+    get_items_master.clear()
+
+@st.cache_data(ttl=300)
+def get_items_master() -> Tuple[pd.DataFrame, dict]:
+    """(items_df, rate_map), cached; call get_items_master.clear() after writing to items."""
     with get_conn() as conn:
-        conn.execute(
-            "INSERT INTO items(item, rate) VALUES(?, ?) "
-            "ON CONFLICT(item) DO UPDATE SET rate=excluded.rate;",
-            (item.strip(), float(rate))
-        )
-        conn.commit()
+        df = pd.read_sql_query("SELECT item, rate FROM items ORDER BY item;", conn)
+    return df, dict(zip(df["item"], df["rate"]))
 
 def get_items_df() -> pd.DataFrame:
-    with get_conn() as conn:
-        return pd.read_sql_query("SELECT item, rate FROM items ORDER BY item;", conn)
+    return get_items_master()[0]
 
 # ---------------- Business ops ----------------
+def _num_col(rows: List[dict], key: str) -> np.ndarray:
+    return np.fromiter((float(r.get(key) or 0) for r in rows), dtype=np.float64, count=len(rows))
+
 def create_invoice(
     date: dt.date,
     person_name: str,
@@ -247,16 +319,16 @@ def create_invoice(
     notes: str = "",
 ) -> Tuple[bool, str, int]:
     """Validates price math; returns (ok, message, invoice_id)."""
-    total = sum((float(l.get("unit_price", 0)) * float(l.get("qty", 0))) for l in lines)
-    coll_total = sum(float(c.get("amount", 0)) for c in collections)
-    due_total  = sum(float(d.get("amount", 0)) for d in dues)
+    total = float(_num_col(lines, "unit_price") @ _num_col(lines, "qty"))
+    coll_total = float(_num_col(collections, "amount").sum())
+    due_total  = float(_num_col(dues, "amount").sum())
     ok = abs(total - (coll_total + due_total)) < 0.005
 
     if not ok:
         msg = f"Total ({total:.2f}) must equal Collections ({coll_total:.2f}) + Dues ({due_total:.2f})."
         return False, msg, -1
 
-    with get_conn() as conn:
+    with write_txn() as conn:
         cur = conn.cursor()
         cur.execute(
             "INSERT INTO invoices(date, person_name, total_amount, collection_amount, due_amount, notes) "
@@ -265,29 +337,34 @@ def create_invoice(
         )
         inv_id = cur.lastrowid
 
-        for i, line in enumerate(lines, start=1):
-            if not line.get("item"): continue
-            cur.execute(
-                "INSERT INTO invoice_lines(invoice_id, line_no, item, unit_price, qty, units, highlight) "
-                "VALUES(?,?,?,?,?,?,?);",
-                (inv_id, i, line["item"], float(line.get("unit_price") or 0),
-                 float(line.get("qty") or 0), line.get("units",""), 1 if line.get("highlight") else 0)
-            )
+        line_rows = [
+            (inv_id, i, line["item"], float(line.get("unit_price") or 0),
+             float(line.get("qty") or 0), line.get("units",""), 1 if line.get("highlight") else 0)
+            for i, line in enumerate(lines, start=1) if line.get("item")
+        ]
+        cur.executemany(
+            "INSERT INTO invoice_lines(invoice_id, line_no, item, unit_price, qty, units, highlight) "
+            "VALUES(?,?,?,?,?,?,?);",
+            line_rows
+        )
 
-        for c in collections:
-            if float(c.get("amount",0)) <= 0: continue
-            method = "Cash" if c.get("method") not in ("Cash","UPI") else c["method"]
-            cur.execute(
-                "INSERT INTO invoice_collections(invoice_id, method, amount) VALUES(?,?,?);",
-                (inv_id, method, float(c["amount"]))
-            )
+        coll_rows = [
+            (inv_id, c["method"] if c.get("method") in ("Cash","UPI") else "Cash", float(c["amount"]))
+            for c in collections if float(c.get("amount",0)) > 0
+        ]
+        cur.executemany(
+            "INSERT INTO invoice_collections(invoice_id, method, amount) VALUES(?,?,?);",
+            coll_rows
+        )
 
-        for d in dues:
-            if float(d.get("amount",0)) <= 0: continue
-            cur.execute(
-                "INSERT INTO invoice_dues(invoice_id, shop_no, amount) VALUES(?,?,?);",
-                (inv_id, str(d["shop_no"]).strip(), float(d["amount"]))
-            )
+        due_rows = [
+            (inv_id, str(d["shop_no"]).strip(), float(d["amount"]))
+            for d in dues if float(d.get("amount",0)) > 0
+        ]
+        cur.executemany(
+            "INSERT INTO invoice_dues(invoice_id, shop_no, amount) VALUES(?,?,?);",
+            due_rows
+        )
 
         # Optional daily aggregate record
         if coll_total != 0:
@@ -295,65 +372,231 @@ def create_invoice(
                 "INSERT INTO collections(date, amount, note) VALUES(?,?,?);",
                 (date.isoformat(), float(coll_total), f"Invoice #{inv_id} - {person_name}")
             )
-
-        conn.commit()
+    bump_data_version()
     return True, f"Invoice #{inv_id} saved.", inv_id
 
 def add_inventory_movement(date: dt.date, rows: List[dict]):
-    with get_conn() as conn:
-        cur = conn.cursor()
-        for r in rows:
-            if not r.get("item"): continue
-            cur.execute(
-                "INSERT INTO inventory_movements(date, item, opening_balance, stock_in, stock_out, stock_returning_today) "
-                "VALUES(?,?,?,?,?,?);",
-                (date.isoformat(), r.get("item"),
-                 float(r.get("opening_balance") or 0.0),
-                 float(r.get("stock_in") or 0.0),
-                 float(r.get("stock_out") or 0.0),
-                 float(r.get("stock_returning_today") or 0.0))
-            )
-        conn.commit()
+    payload = [
+        (date.isoformat(), r.get("item"),
+         float(r.get("opening_balance") or 0.0),
+         float(r.get("stock_in") or 0.0),
+         float(r.get("stock_out") or 0.0),
+         float(r.get("stock_returning_today") or 0.0))
+        for r in rows if r.get("item")
+    ]
+    with write_txn() as conn:
+        conn.executemany(
+            "INSERT INTO inventory_movements(date, item, opening_balance, stock_in, stock_out, stock_returning_today) "
+            "VALUES(?,?,?,?,?,?);",
+            payload
+        )
+    bump_data_version()
+
+# Data Extraction: one fixed SQL text per table (stays in sqlite3's statement cache);
+# user-picked columns are projected in pandas against these allowlists.
+INVOICE_COLS = ["id","date","person_name","total_amount","collection_amount","due_amount","notes"]
+INVENTORY_COLS = ["date","item","opening_balance","stock_in","stock_out","stock_returning_today","closing_balance","stock_remaining"]
+INVOICE_EXTRACT_SQL = ("SELECT " + ", ".join(INVOICE_COLS) +
+                       " FROM invoices WHERE date BETWEEN ? AND ? ORDER BY date, id;")
+INVENTORY_EXTRACT_SQL = ("SELECT " + ", ".join(INVENTORY_COLS) +
+                         " FROM inventory_movements WHERE date BETWEEN ? AND ? ORDER BY date, item;")
+
+def qdf(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> pd.DataFrame:
+    """fetchall() straight into a DataFrame; skips read_sql_query's chunked fetch + inference."""
+    cur = conn.execute(sql, params)
+    return pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Narrow the 0/1 flag and low-cardinality labels before st.dataframe's Arrow serialization.
+    Money columns stay float64: float32 would round rupee totals past ~7 significant digits."""
+    if "highlight" in df:
+        df["highlight"] = df["highlight"].astype("int8")
+    for c in ("method", "shop_no"):
+        if c in df:
+            df[c] = df[c].astype("category")
+    return df
+
+def write_df_rows(ws, df: pd.DataFrame):
+    """Header + rows strictly top-to-bottom. Required under xlsxwriter constant_memory, which flushes
+    each row once the next starts (pandas' to_excel writes column-by-column and would lose cells)."""
+    ws.write_row(0, 0, [str(c) for c in df.columns])
+    # One object ndarray -> nested lists of native int/float/str; no per-row Series or namedtuple
+    body = df.to_numpy(dtype=object)
+    na = pd.isna(body)
+    if na.any():
+        body[na] = None
+    for r, row in enumerate(body.tolist(), start=1):
+        ws.write_row(r, 0, row)
+
+def write_cursor_rows(ws, cur: sqlite3.Cursor):
+    """write_df_rows for a live cursor: rows go from SQLite to the sheet one at a time, never held in a frame.
+    The query must ORDER BY the sheet's row order (constant_memory cannot seek back)."""
+    ws.write_row(0, 0, [d[0] for d in cur.description])
+    for r, row in enumerate(cur, start=1):
+        ws.write_row(r, 0, row)
 
 def df_to_csv_download(df: pd.DataFrame, filename: str) -> Tuple[bytes, str]:
     return df.to_csv(index=False).encode("utf-8"), filename
 
 def df_to_excel_download(df: pd.DataFrame, filename: str) -> Tuple[bytes, str]:
     buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Data")
+    if PyExcelerateWorkbook is not None:
+        # pyexcelerate serializes the sheet XML in bulk; far faster than per-cell xlsxwriter for big frames
+        body = df.astype(object).where(df.notna(), None).values.tolist()
+        wb = PyExcelerateWorkbook()
+        wb.new_sheet("Data", data=[[str(c) for c in df.columns]] + body)
+        wb.save(buf)
+    else:
+        with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
+            df.to_excel(writer, index=False, sheet_name="Data")
     return buf.getvalue(), filename
 
+# ---------------- Admin data ----------------
+ADMIN_PAGE_SIZE = 500  # newest rows shown per admin table
+# Fixed texts so every rerun hits the connection's compiled-statement cache. Each ORDER BY walks an
+# existing index backwards; any tie-break column sorts only within the LIMIT window
+Q_ADMIN_INVOICES = "SELECT * FROM invoices ORDER BY id DESC LIMIT ?;"
+Q_ADMIN_LINES = "SELECT * FROM invoice_lines ORDER BY invoice_id DESC, line_no LIMIT ?;"
+Q_ADMIN_COLLECTIONS = "SELECT * FROM invoice_collections ORDER BY invoice_id DESC LIMIT ?;"
+Q_ADMIN_DUES = "SELECT * FROM invoice_dues ORDER BY invoice_id DESC LIMIT ?;"
+Q_ADMIN_MOVEMENTS = "SELECT * FROM inventory_movements ORDER BY date DESC, item LIMIT ?;"
+
+@st.cache_resource
+def _data_version_box() -> dict:
+    """Process-wide write counter; bumped by invoice/movement saves and admin deletes."""
+    return {"v": 0}
+
+def data_version() -> int:
+    return _data_version_box()["v"]
+
+def bump_data_version():
+    _data_version_box()["v"] += 1
+
+@st.cache_data(ttl=300, show_spinner=False)
+def admin_snapshot(version: int) -> Tuple[pd.DataFrame, ...]:
+    """All five admin listings (invoices, lines, collections, dues, movements) fetched in one pass on one
+    connection; `version` (data_version()) changes after any write, forcing a refetch."""
+    with get_conn() as conn:
+        return tuple(compact_dtypes(qdf(conn, q, (ADMIN_PAGE_SIZE,))) for q in
+                     (Q_ADMIN_INVOICES, Q_ADMIN_LINES, Q_ADMIN_COLLECTIONS, Q_ADMIN_DUES, Q_ADMIN_MOVEMENTS))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def report_tables(day: str, version: int):
+    """Reports page data for one ISO date: (total, collected, due, inv, grp, g2, lines).
+    Cached so widget reruns and the export reuse the frames; `version` refetches after writes."""
+    with get_conn() as conn:
+        # Headline totals aggregated in SQLite rather than summed over the fetched rows
+        inv_total, inv_coll, inv_due = conn.execute(
+            "SELECT COALESCE(SUM(total_amount), 0), COALESCE(SUM(collection_amount), 0), "
+            "COALESCE(SUM(due_amount), 0) FROM invoices WHERE date = ?;",
+            (day,)
+        ).fetchone()
+        inv = qdf(conn,
+            "SELECT id, person_name, total_amount, collection_amount, due_amount FROM invoices WHERE date = ? ORDER BY id;",
+            (day,)
+        )
+        # Breakdowns reduced in SQLite; only the per-group totals cross into pandas
+        grp = qdf(conn,
+            "SELECT ic.method, SUM(ic.amount) AS amount FROM invoice_collections ic "
+            "JOIN invoices i ON i.id = ic.invoice_id WHERE i.date = ? GROUP BY ic.method ORDER BY ic.method;",
+            (day,))
+        g2 = qdf(conn,
+            "SELECT d.shop_no, SUM(d.amount) AS amount FROM invoice_dues d "
+            "JOIN invoices i ON i.id = d.invoice_id WHERE i.date = ? GROUP BY d.shop_no ORDER BY d.shop_no;",
+            (day,))
+        lines = qdf(conn,
+            "SELECT l.invoice_id, l.line_no, l.item, l.qty, l.unit_price, l.amount, l.highlight "
+            "FROM invoice_lines l JOIN invoices i ON i.id = l.invoice_id WHERE i.date = ? "
+            "ORDER BY l.invoice_id, l.line_no;",
+            (day,)
+        )
+    return inv_total, inv_coll, inv_due, inv, compact_dtypes(grp), compact_dtypes(g2), compact_dtypes(lines)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def report_workbook(day: str, version: int) -> bytes:
+    """Daily report xlsx (Bills, Collections, Dues, Lines), built once per (day, version) rather than per rerun."""
+    _, _, _, inv, _, _, lines = report_tables(day, version)
+    buf = io.BytesIO()
+    book = xlsxwriter.Workbook(buf, {"constant_memory": True, "strings_to_numbers": False})
+    write_df_rows(book.add_worksheet("Bills"), inv)
+    # Collections/Dues rows are only exported, never displayed: stream them straight off the cursor
+    with get_conn() as conn:
+        write_cursor_rows(book.add_worksheet("Collections"), conn.execute(
+            "SELECT ic.invoice_id, ic.method, ic.amount FROM invoice_collections ic "
+            "JOIN invoices i ON i.id = ic.invoice_id WHERE i.date = ? ORDER BY ic.invoice_id, ic.id;",
+            (day,)))
+        write_cursor_rows(book.add_worksheet("Dues"), conn.execute(
+            "SELECT d.invoice_id, d.shop_no, d.amount FROM invoice_dues d "
+            "JOIN invoices i ON i.id = d.invoice_id WHERE i.date = ? ORDER BY d.invoice_id, d.id;",
+            (day,)))
+    write_df_rows(book.add_worksheet("Lines"), lines)
+    book.set_properties({'title': f"Report {day}"})
+    book.close()
+    return buf.getvalue()
+
+def admin_delete(table: str, row_id: int):
+    """Delete one row by id in its own write transaction (cascades included)."""
+    with write_txn() as conn:
+        conn.execute(f"DELETE FROM {table} WHERE id = ?;", (int(row_id),))
+    bump_data_version()
+
 # ---------------- Auth / Email ----------------
+@st.cache_resource
+def _email_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="admin-email")
+
+def _smtp_send(subject: str, body: str):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = SMTP_SENDER
+    msg["To"] = ADMIN_NOTIFY_EMAIL
+    msg.set_content(body)
+    context = ssl.create_default_context()
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
+        server.starttls(context=context)
+        server.login(SMTP_USER, SMTP_PASS)
+        server.send_message(msg)
+
 def send_admin_email(subject: str, body: str):
+    """Queue the SMTP send off the render path; the outcome is reported on a later rerun."""
     if not SMTP_HOST or not SMTP_USER or not SMTP_PASS:
         st.warning("SMTP not configured; skipping email notification.")
         return
-    try:
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = SMTP_SENDER
-        msg["To"] = ADMIN_NOTIFY_EMAIL
-        msg.set_content(body)
-        context = ssl.create_default_context()
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls(context=context)
-            server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
+    st.session_state.admin_email_job = _email_executor().submit(_smtp_send, subject, body)
+
+def _report_admin_email_job():
+    job = st.session_state.get("admin_email_job")
+    if job is None or not job.done():
+        return
+    del st.session_state.admin_email_job
+    if job.exception() is not None:
+        st.warning(f"Unable to send email: {job.exception()}")
+    else:
         st.success("Admin login notification email sent.")
-    except Exception as e:
-        st.warning(f"Unable to send email: {e}")
+
+@st.cache_resource
+def _admin_pass_hash() -> Tuple[bytes, bytes]:
+    """(salt, scrypt(ADMIN_PASS)) computed once per process."""
+    salt = os.urandom(16)
+    return salt, hashlib.scrypt(ADMIN_PASS.encode(), salt=salt, n=2**14, r=8, p=1, dklen=32)
+
+def check_admin_credentials(user: str, password: str) -> bool:
+    salt, expected = _admin_pass_hash()
+    given = hashlib.scrypt(password.encode(), salt=salt, n=2**14, r=8, p=1, dklen=32)
+    user_ok = hmac.compare_digest(user.encode(), ADMIN_USER.encode())
+    return hmac.compare_digest(given, expected) and user_ok
 
 def require_admin_auth() -> bool:
     if "authed" not in st.session_state:
         st.session_state.authed = False
     if st.session_state.authed:
+        _report_admin_email_job()
         return True
     st.subheader("Admin Login")
     u = st.text_input("User ID")
     p = st.text_input("Password", type="password")
     if st.button("Login"):
-        if u == ADMIN_USER and p == ADMIN_PASS:
+        if check_admin_credentials(u, p):
             st.session_state.authed = True
             st.success("Authenticated.")
             send_admin_email("Admin Login", f"Admin user '{u}' logged in at {dt.datetime.now()}.")
@@ -363,10 +606,17 @@ def require_admin_auth() -> bool:
     return False
 
 # ---------------- Startup ----------------
-def init_all():
+@st.cache_resource(show_spinner=False)
+def _bootstrap_schema() -> bool:
+    """DDL + migrations once per server process instead of on every rerun."""
+    enable_wal()
     init_db_schema()
     migrate_db()          # <-- run migrations for older DBs
-    ensure_seed_items()
+    return True
+
+def init_all():
+    _bootstrap_schema()
+    ensure_seed_items()   # stays per-rerun: one COUNT(*), and its notices shouldn't be cached/replayed
 
 st.markdown("<h1 class='title'>🧮 Inventory & Billing System</h1>", unsafe_allow_html=True)
 st.markdown("<div class='subtitle'>SQLite-backed • With validations, admin & reports</div>", unsafe_allow_html=True)
@@ -387,21 +637,22 @@ if page == "Billing":
     with c3:
         notes = st.text_input("Notes (optional)", placeholder="Any remarks...")
 
-    items_df = get_items_df()
+    items_df, rate_map = get_items_master()
     item_names = items_df["item"].tolist()
-    rate_map = dict(zip(items_df["item"], items_df["rate"]))
 
     st.markdown("#### Line Items (auto-listed from Master Data) — tick **Highlight** for emphasis")
     if len(items_df) > 0:
-        default_rows = [
-            {"item": row["item"], "unit_price": float(row["rate"] or 0), "qty": 0.0, "units": "UNITS", "highlight": False}
-            for _, row in items_df.iterrows()
-        ]
+        default_df = pd.DataFrame({
+            "item": items_df["item"],
+            "unit_price": items_df["rate"].astype(float).fillna(0.0),
+            "qty": 0.0, "units": "UNITS", "highlight": False,
+        })
     else:
-        default_rows = [{"item": "", "unit_price": 0.0, "qty": 0.0, "units": "UNITS", "highlight": False} for _ in range(10)]
+        default_df = pd.DataFrame([{"item": "", "unit_price": 0.0, "qty": 0.0, "units": "UNITS", "highlight": False}
+                                   for _ in range(10)])
 
     edited = st.data_editor(
-        pd.DataFrame(default_rows),
+        default_df,
         column_config={
             "item": st.column_config.SelectboxColumn("ITEM NAME", options=item_names, required=False, width="large"),
             "unit_price": st.column_config.NumberColumn("UNIT PRICE", step=0.01, format="%.2f"),
@@ -417,15 +668,19 @@ if page == "Billing":
     # Auto-fill price if user changes item to another one with zero price
     def autofill_prices(df: pd.DataFrame) -> pd.DataFrame:
         out = df.copy()
-        for idx, row in out.iterrows():
-            it = str(row.get("item") or "").strip()
-            if it and (not row.get("unit_price") or float(row["unit_price"]) == 0.0):
-                if it in rate_map:
-                    out.at[idx, "unit_price"] = float(rate_map[it])
+        mapped = out["item"].fillna("").astype(str).str.strip().map(rate_map).astype(float)
+        price = out["unit_price"].astype(float)
+        needs_fill = (price.fillna(0.0) == 0.0) & mapped.notna()
+        out["unit_price"] = price.mask(needs_fill, mapped)
         return out
 
     edited = autofill_prices(edited)
-    edited["amount"] = (edited["unit_price"].astype(float).fillna(0) * edited["qty"].astype(float).fillna(0)).round(2)
+    # to_numpy(na_value=0) fills NaN during the float64 conversion (no separate fillna pass);
+    # the multiply/round then reuse one output buffer
+    unit_price = pd.to_numeric(edited["unit_price"], errors="coerce").to_numpy(dtype=np.float64, na_value=0.0)
+    qty = pd.to_numeric(edited["qty"], errors="coerce").to_numpy(dtype=np.float64, na_value=0.0)
+    amount = np.multiply(unit_price, qty)
+    edited["amount"] = np.round(amount, 2, out=amount)
     st.dataframe(edited, width="stretch")
 
     total_amount = float(edited["amount"].sum())
@@ -524,16 +779,16 @@ elif page == "Inventory":
 
     st.markdown("Enter movements; rows auto-listed from Master Data. Closing/Remaining auto-computed.")
     if len(items_df) > 0:
-        default_rows = [{
-            "item": row["item"],
+        default_df = pd.DataFrame({
+            "item": items_df["item"],
             "opening_balance": 0.0, "stock_in": 0.0, "stock_out": 0.0, "stock_returning_today": 0.0,
-        } for _, row in items_df.iterrows()]
+        })
     else:
-        default_rows = [{"item": "", "opening_balance": 0.0, "stock_in": 0.0, "stock_out": 0.0, "stock_returning_today": 0.0}
-                        for _ in range(10)]
+        default_df = pd.DataFrame([{"item": "", "opening_balance": 0.0, "stock_in": 0.0, "stock_out": 0.0, "stock_returning_today": 0.0}
+                                   for _ in range(10)])
 
     inv_edit = st.data_editor(
-        pd.DataFrame(default_rows),
+        default_df,
         column_config={
             "item": st.column_config.SelectboxColumn("ITEM", options=item_names, required=False, width="large"),
             "opening_balance": st.column_config.NumberColumn("OPENING STOCK BALANCE", step=1.0, format="%.2f"),
@@ -585,23 +840,22 @@ elif page == "Data Extraction":
         with c2: d2 = st.date_input("To Date", value=dt.date.today())
         cols = st.multiselect(
             "Invoice Columns",
-            ["id","date","person_name","total_amount","collection_amount","due_amount","notes"],
+            INVOICE_COLS,
             default=["id","date","person_name","total_amount","collection_amount","due_amount"]
         )
+        ql = (
+            "SELECT il.invoice_id, i.date, i.person_name, il.line_no, il.item, il.unit_price, il.qty, il.amount, il.highlight "
+            "FROM invoice_lines il JOIN invoices i ON i.id = il.invoice_id "
+            "WHERE i.date BETWEEN ? AND ? ORDER BY il.invoice_id, il.line_no;"
+        )
         with get_conn() as conn:
-            q = "SELECT " + ", ".join(cols) + " FROM invoices WHERE date BETWEEN ? AND ? ORDER BY date, id;"
-            df = pd.read_sql_query(q, conn, params=(d1.isoformat(), d2.isoformat()))
+            df = qdf(conn, INVOICE_EXTRACT_SQL, (d1.isoformat(), d2.isoformat()))
+            dfl = qdf(conn, ql, (d1.isoformat(), d2.isoformat()))
+        df = df[[c for c in cols if c in INVOICE_COLS]]
         st.dataframe(df, width="stretch")
         st.download_button("⬇️ CSV (Invoices)", *df_to_csv_download(df, "invoices.csv"), mime="text/csv")
 
         st.markdown("**Invoice Lines (includes highlight flag)**")
-        with get_conn() as conn:
-            ql = (
-                "SELECT il.invoice_id, i.date, i.person_name, il.line_no, il.item, il.unit_price, il.qty, il.amount, il.highlight "
-                "FROM invoice_lines il JOIN invoices i ON i.id = il.invoice_id "
-                "WHERE i.date BETWEEN ? AND ? ORDER BY il.invoice_id, il.line_no;"
-            )
-            dfl = pd.read_sql_query(ql, conn, params=(d1.isoformat(), d2.isoformat()))
         st.dataframe(dfl, width="stretch")
         st.download_button("⬇️ CSV (Lines)", *df_to_csv_download(dfl, "invoice_lines.csv"), mime="text/csv")
 
@@ -611,11 +865,11 @@ elif page == "Data Extraction":
         with c2: d2 = st.date_input("To Date  ", value=dt.date.today(), key="inv_to")
         inv_cols = st.multiselect(
             "Inventory Columns",
-            ["date","item","opening_balance","stock_in","stock_out","stock_returning_today","closing_balance","stock_remaining"],
-            default=["date","item","opening_balance","stock_in","stock_out","stock_returning_today","closing_balance","stock_remaining"])
+            INVENTORY_COLS,
+            default=INVENTORY_COLS)
         with get_conn() as conn:
-            q = "SELECT " + ", ".join(inv_cols) + " FROM inventory_movements WHERE date BETWEEN ? AND ? ORDER BY date, item;"
-            df = pd.read_sql_query(q, conn, params=(d1.isoformat(), d2.isoformat()))
+            df = qdf(conn, INVENTORY_EXTRACT_SQL, (d1.isoformat(), d2.isoformat()))
+        df = df[[c for c in inv_cols if c in INVENTORY_COLS]]
         st.dataframe(df, width="stretch")
         st.download_button("⬇️ CSV (Inventory)", *df_to_csv_download(df, "inventory.csv"), mime="text/csv")
 
@@ -623,15 +877,18 @@ elif page == "Data Extraction":
         c1, c2 = st.columns(2)
         with c1: d1 = st.date_input("From Date  ", value=dt.date.today().replace(day=1), key="col_from")
         with c2: d2 = st.date_input("To Date    ", value=dt.date.today(), key="col_to")
+        # Collections and dues share a shape, so one UNION ALL round trip tagged by `kind`
         with get_conn() as conn:
-            dcf = pd.read_sql_query(
-                "SELECT ic.invoice_id, i.date, i.person_name, ic.method, ic.amount "
-                "FROM invoice_collections ic JOIN invoices i ON i.id = ic.invoice_id "
-                "WHERE i.date BETWEEN ? AND ? ORDER BY ic.invoice_id;", conn, params=(d1.isoformat(), d2.isoformat()))
-            ddf = pd.read_sql_query(
-                "SELECT d.invoice_id, i.date, i.person_name, d.shop_no, d.amount "
-                "FROM invoice_dues d JOIN invoices i ON i.id = d.invoice_id "
-                "WHERE i.date BETWEEN ? AND ? ORDER BY d.invoice_id;", conn, params=(d1.isoformat(), d2.isoformat()))
+            both = qdf(conn,
+                "SELECT 'coll' AS kind, ic.invoice_id, i.date, i.person_name, ic.method AS key, ic.amount "
+                "FROM invoice_collections ic JOIN invoices i ON i.id = ic.invoice_id WHERE i.date BETWEEN ?1 AND ?2 "
+                "UNION ALL "
+                "SELECT 'due', d.invoice_id, i.date, i.person_name, d.shop_no, d.amount "
+                "FROM invoice_dues d JOIN invoices i ON i.id = d.invoice_id WHERE i.date BETWEEN ?1 AND ?2 "
+                "ORDER BY invoice_id;", (d1.isoformat(), d2.isoformat()))
+        is_coll = both["kind"] == "coll"
+        dcf = both.loc[is_coll].drop(columns="kind").rename(columns={"key": "method"}).reset_index(drop=True)
+        ddf = both.loc[~is_coll].drop(columns="kind").rename(columns={"key": "shop_no"}).reset_index(drop=True)
         st.markdown("**Collections (Cash/UPI)**")
         st.dataframe(dcf, width="stretch")
         st.download_button("⬇️ CSV (Collections)", *df_to_csv_download(dcf, "invoice_collections.csv"), mime="text/csv")
@@ -644,26 +901,14 @@ elif page == "Reports":
     st.subheader("Reports")
     rep_date = st.date_input("Report Date", value=dt.date.today())
 
+    # Index-only probe (ix_invoices_date): empty days skip the report queries and the workbook build
     with get_conn() as conn:
-        inv = pd.read_sql_query(
-            "SELECT id, person_name, total_amount, collection_amount, due_amount FROM invoices WHERE date = ? ORDER BY id;",
-            conn, params=(rep_date.isoformat(),)
-        )
-        coll = pd.read_sql_query(
-            "SELECT ic.invoice_id, ic.method, ic.amount FROM invoice_collections ic "
-            "JOIN invoices i ON i.id = ic.invoice_id WHERE i.date = ?;", conn, params=(rep_date.isoformat(),))
-        dues = pd.read_sql_query(
-            "SELECT d.invoice_id, d.shop_no, d.amount FROM invoice_dues d "
-            "JOIN invoices i ON i.id = d.invoice_id WHERE i.date = ?;", conn, params=(rep_date.isoformat(),))
-        lines = pd.read_sql_query(
-            "SELECT l.invoice_id, l.line_no, l.item, l.qty, l.unit_price, l.amount, l.highlight "
-            "FROM invoice_lines l JOIN invoices i ON i.id = l.invoice_id WHERE i.date = ?;",
-            conn, params=(rep_date.isoformat(),)
-        )
+        has_bills = conn.execute("SELECT 1 FROM invoices WHERE date = ? LIMIT 1;", (rep_date.isoformat(),)).fetchone()
+    if has_bills is None:
+        st.info("No bills for this date.")
+        st.stop()
 
-    inv_total = inv["total_amount"].sum() if not inv.empty else 0.0
-    inv_coll  = inv["collection_amount"].sum() if not inv.empty else 0.0
-    inv_due   = inv["due_amount"].sum() if not inv.empty else 0.0
+    inv_total, inv_coll, inv_due, inv, grp, g2, lines = report_tables(rep_date.isoformat(), data_version())
 
     c1, c2, c3 = st.columns(3)
     with c1: st.metric("Total Billed (₹)", f"{inv_total:,.2f}")
@@ -674,37 +919,30 @@ elif page == "Reports":
     st.dataframe(inv, width="stretch")
 
     st.markdown("#### Collections Breakdown (Cash vs UPI)")
-    if not coll.empty:
-        grp = coll.groupby("method", as_index=False)["amount"].sum()
+    if not grp.empty:
         st.dataframe(grp, width="stretch")
     else:
         st.info("No collections.")
 
     st.markdown("#### Dues by Shop")
-    if not dues.empty:
-        g2 = dues.groupby("shop_no", as_index=False)["amount"].sum()
+    if not g2.empty:
         st.dataframe(g2, width="stretch")
     else:
         st.info("No dues.")
 
     st.markdown("#### Highlighted Items")
     if not lines.empty:
-        hi = lines[lines["highlight"] == 1]
+        # lines already arrives ORDER BY invoice_id, line_no; a plain ndarray mask keeps that order
+        hi = lines.loc[lines["highlight"].to_numpy() == 1]
         if hi.empty:
             st.info("No highlighted items today.")
         else:
-            st.dataframe(hi.sort_values(["invoice_id","line_no"]), width="stretch")
+            st.dataframe(hi, width="stretch")
     else:
         st.info("No line items today.")
 
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-        inv.to_excel(writer, index=False, sheet_name="Bills")
-        coll.to_excel(writer, index=False, sheet_name="Collections")
-        dues.to_excel(writer, index=False, sheet_name="Dues")
-        lines.to_excel(writer, index=False, sheet_name="Lines")
-        writer.book.set_properties({'title': f"Report {rep_date}"})
-    st.download_button("⬇️ Download Daily Report (Excel)", data=buf.getvalue(), file_name=f"report_{rep_date}.xlsx")
+    st.download_button("⬇️ Download Daily Report (Excel)", data=report_workbook(rep_date.isoformat(), data_version()),
+                       file_name=f"report_{rep_date}.xlsx")
 
 # ---------------- Master Data ----------------
 elif page == "Master Data":
@@ -713,11 +951,12 @@ elif page == "Master Data":
     df_items = get_items_df()
     st.dataframe(df_items, width="stretch")
 
-    with st.expander("Add / Update Item"):
+    # Forms hold keystrokes client-side; the script reruns only on submit
+    with st.expander("Add / Update Item"), st.form("add_item"):
         c1, c2 = st.columns([3, 1])
         with c1: item = st.text_input("Item Name")
         with c2: rate = st.number_input("Rate", min_value=0.0, step=0.1)
-        if st.button("Save Item"):
+        if st.form_submit_button("Save Item"):
             if not item.strip():
                 st.error("Item name is required.")
             else:
@@ -725,9 +964,9 @@ elif page == "Master Data":
                 st.success(f"Saved rate {rate} for item '{item}'.")
                 st.experimental_rerun()
 
-    with st.expander("Import Items from XLSM again"):
+    with st.expander("Import Items from XLSM again"), st.form("import_items"):
         path = st.text_input("XLSM Path", value=XLSM_PATH)
-        if st.button("Import Now"):
+        if st.form_submit_button("Import Now"):
             if not os.path.exists(path):
                 st.error("File not found.")
             else:
@@ -735,14 +974,7 @@ elif page == "Master Data":
                 if items.empty:
                     st.warning("No items found in the XLSM.")
                 else:
-                    with get_conn() as conn:
-                        for _, r in items.iterrows():
-                            conn.execute(
-                                "INSERT INTO items(item, rate) VALUES(?, ?) "
-                                "ON CONFLICT(item) DO UPDATE SET rate=excluded.rate;",
-                                (str(r["item"]).strip(), float(r["rate"]))
-                            )
-                        conn.commit()
+                    upsert_items(items)
                     st.success(f"Imported/updated {len(items)} items.")
                     st.experimental_rerun()
 
@@ -752,58 +984,39 @@ else:
         st.stop()
 
     st.subheader("Admin • Manage Records")
+    adm_inv, adm_lines, adm_coll, adm_dues, adm_mov = admin_snapshot(data_version())
 
     with st.expander("Invoices"):
-        with get_conn() as conn:
-            df = pd.read_sql_query("SELECT * FROM invoices ORDER BY id DESC LIMIT 500;", conn)
-        st.dataframe(df, width="stretch")
+        st.dataframe(adm_inv, width="stretch")
         del_id = st.number_input("Delete invoice by ID", step=1, min_value=0)
         if st.button("Delete Invoice"):
-            with get_conn() as conn:
-                conn.execute("DELETE FROM invoices WHERE id = ?;", (int(del_id),))
-                conn.commit()
+            admin_delete("invoices", del_id)
             st.success(f"Deleted invoice {int(del_id)} (if existed).")
 
     with st.expander("Invoice Lines"):
-        with get_conn() as conn:
-            df = pd.read_sql_query("SELECT * FROM invoice_lines ORDER BY invoice_id DESC, line_no;", conn)
-        st.dataframe(df, width="stretch")
+        st.dataframe(adm_lines, width="stretch")
         ln_id = st.number_input("Delete line by ID", step=1, min_value=0, key="del_line")
         if st.button("Delete Line"):
-            with get_conn() as conn:
-                conn.execute("DELETE FROM invoice_lines WHERE id = ?;", (int(ln_id),))
-                conn.commit()
+            admin_delete("invoice_lines", ln_id)
             st.success(f"Deleted line {int(ln_id)} (if existed).")
 
     with st.expander("Invoice Collections"):
-        with get_conn() as conn:
-            df = pd.read_sql_query("SELECT * FROM invoice_collections ORDER BY invoice_id DESC;", conn)
-        st.dataframe(df, width="stretch")
+        st.dataframe(adm_coll, width="stretch")
         cid = st.number_input("Delete collection by ID", step=1, min_value=0, key="del_col")
         if st.button("Delete Collection"):
-            with get_conn() as conn:
-                conn.execute("DELETE FROM invoice_collections WHERE id = ?;", (int(cid),))
-                conn.commit()
+            admin_delete("invoice_collections", cid)
             st.success(f"Deleted collection {int(cid)} (if existed).")
 
     with st.expander("Invoice Dues"):
-        with get_conn() as conn:
-            df = pd.read_sql_query("SELECT * FROM invoice_dues ORDER BY invoice_id DESC;", conn)
-        st.dataframe(df, width="stretch")
+        st.dataframe(adm_dues, width="stretch")
         did = st.number_input("Delete due by ID", step=1, min_value=0, key="del_due")
         if st.button("Delete Due"):
-            with get_conn() as conn:
-                conn.execute("DELETE FROM invoice_dues WHERE id = ?;", (int(did),))
-                conn.commit()
+            admin_delete("invoice_dues", did)
             st.success(f"Deleted due {int(did)} (if existed).")
 
     with st.expander("Inventory Movements"):
-        with get_conn() as conn:
-            df = pd.read_sql_query("SELECT * FROM inventory_movements ORDER BY date DESC, item;", conn)
-        st.dataframe(df, width="stretch")
+        st.dataframe(adm_mov, width="stretch")
         mid = st.number_input("Delete movement by ID", step=1, min_value=0, key="del_mov")
         if st.button("Delete Movement"):
-            with get_conn() as conn:
-                conn.execute("DELETE FROM inventory_movements WHERE id = ?;", (int(mid),))
-                conn.commit()
+            admin_delete("inventory_movements", mid)
             st.success(f"Deleted movement {int(mid)} (if existed).")